@@ -109,36 +109,26 @@ export async function GET(req: NextRequest) {
     const seatZones = getSeatZones();
 
     // Determine current period or use sim_time for bucket
+    const periods = getGamePeriods(gameTime);
     let targetHour: number;
     let targetMinBucket: number;
     let currentPeriod: string;
 
-    if (simTimeIso) {
-      try {
-        const d = new Date(simTimeIso);
-        targetHour = d.getHours();
-        targetMinBucket = Math.floor(d.getMinutes() / 10) * 10;
-        currentPeriod = periodOverride || 'Simulated';
-      } catch {
-        const periods = getGamePeriods(gameTime);
-        const nowMin = new Date().getHours() * 60 + new Date().getMinutes();
-        currentPeriod = periodOverride || getCurrentPeriod(periods, nowMin);
-        const tb = periodToTimeBucket(currentPeriod, gameTime);
-        targetHour = tb.hour;
-        targetMinBucket = tb.minBucket;
-      }
+    // new Date() never throws on bad input — an unparseable sim_time yields NaN, so check that instead
+    const simTime = simTimeIso ? new Date(simTimeIso) : null;
+    if (simTime && !Number.isNaN(simTime.getTime())) {
+      targetHour = simTime.getHours();
+      targetMinBucket = Math.floor(simTime.getMinutes() / 10) * 10;
+      currentPeriod = periodOverride || 'Simulated';
     } else {
-      const periodList = getGamePeriods(gameTime);
       const now = new Date();
       const nowMin = now.getHours() * 60 + now.getMinutes();
-      currentPeriod = periodOverride || getCurrentPeriod(periodList, nowMin);
+      currentPeriod = periodOverride || getCurrentPeriod(periods, nowMin);
       const tb = periodToTimeBucket(currentPeriod, gameTime);
       targetHour = tb.hour;
       targetMinBucket = tb.minBucket;
     }
 
-    const periods = getGamePeriods(gameTime);
-
     // Build category mix by location
     const catMixByLocation: Record<string, { category: string; avg_items: number }[]> = {};
     for (const row of categoryMix) {
@@ -246,10 +236,8 @@ export async function GET(req: NextRequest) {
 
     if (preferredStand && zoneId && locationPositions[preferredStand]) {
       try {
-        const { getDb } = await import('@/lib/db');
-        const db = getDb();
-        const zoneDistances = db
-          .prepare('SELECT location, distance_m FROM zone_distances WHERE zone_id = ?')
+        const { prepare } = await import('@/lib/db');
+        const zoneDistances = prepare('SELECT location, distance_m FROM zone_distances WHERE zone_id = ?')
           .all(zoneId) as { location: string; distance_m: number }[];
         const distMap = new Map(zoneDistances.map((r) => [r.location, r.distance_m]));
 
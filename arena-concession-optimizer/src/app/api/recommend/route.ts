@@ -1,5 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { getDb } from '@/lib/db';
+import { prepare } from '@/lib/db';
 import {
   getDemandCurve,
   getCategoryMixForFan,
@@ -154,14 +154,10 @@ export async function POST(req: NextRequest) {
     );
   }
 
-  const db = getDb();
-
   // Walking distances from zone -> stand
-  const zoneDistances = db
-    .prepare(
-      'SELECT location, distance_m FROM zone_distances WHERE zone_id = ?',
-    )
-    .all(zone_id) as { location: string; distance_m: number }[];
+  const zoneDistances = prepare(
+    'SELECT location, distance_m FROM zone_distances WHERE zone_id = ?',
+  ).all(zone_id) as { location: string; distance_m: number }[];
 
   if (!zoneDistances.length) {
     return NextResponse.json(
@@ -176,15 +172,13 @@ export async function POST(req: NextRequest) {
   }
 
   // Which stands historically sell the desired item?
-  const itemLocations = db
-    .prepare(
-      `
-      SELECT DISTINCT location
-      FROM item_availability
-      WHERE item = ?
-    `,
-    )
-    .all(desired_item) as { location: string }[];
+  const itemLocations = prepare(
+    `
+    SELECT DISTINCT location
+    FROM item_availability
+    WHERE item = ?
+  `,
+  ).all(desired_item) as { location: string }[];
 
   if (!itemLocations.length) {
     return NextResponse.json(
@@ -194,18 +188,16 @@ export async function POST(req: NextRequest) {
   }
 
   // Category of the desired item (for alternatives)
-  const itemCategoryRow = db
-    .prepare(
-      `
-      SELECT category
-      FROM transactions
-      WHERE item = ? AND is_refund = 0
-      GROUP BY category
-      ORDER BY COUNT(*) DESC
-      LIMIT 1
-    `,
-    )
-    .get(desired_item) as { category?: string } | undefined;
+  const itemCategoryRow = prepare(
+    `
+    SELECT category
+    FROM transactions
+    WHERE item = ? AND is_refund = 0
+    GROUP BY category
+    ORDER BY COUNT(*) DESC
+    LIMIT 1
+  `,
+  ).get(desired_item) as { category?: string } | undefined;
 
   const desiredCategory = itemCategoryRow?.category;
 
@@ -270,15 +262,13 @@ export async function POST(req: NextRequest) {
     best.round_trip_minutes > max_minutes &&
     desiredCategory
   ) {
-    const altRows = db
-      .prepare(
-        `
-        SELECT DISTINCT t.item, t.location
-        FROM transactions t
-        WHERE t.category = ? AND t.item != ? AND t.is_refund = 0
-      `,
-      )
-      .all(desiredCategory, desired_item) as {
+    const altRows = prepare(
+      `
+      SELECT DISTINCT t.item, t.location
+      FROM transactions t
+      WHERE t.category = ? AND t.item != ? AND t.is_refund = 0
+    `,
+    ).all(desiredCategory, desired_item) as {
       item: string;
       location: string;
     }[];
@@ -1,5 +1,5 @@
 import { NextRequest } from 'next/server';
-import { getDb } from '@/lib/db';
+import { prepare } from '@/lib/db';
 import { getHistoricalCapacityPerStand } from '@/lib/queries';
 
 export const runtime = 'nodejs';
@@ -18,37 +18,30 @@ interface SimBucket {
 }
 
 function buildBuckets(gameDate: string, bucketSeconds: number): SimBucket[] {
-  const db = getDb();
-
-  const rows = db
-    .prepare(
-      `
-      SELECT timestamp, location, qty, item, category
-      FROM transactions
-      WHERE date = ? AND is_refund = 0
-      ORDER BY timestamp
-    `,
-    )
-    .all(gameDate) as {
+  const rows = prepare(
+    `
+    SELECT timestamp, location, qty, item
+    FROM transactions
+    WHERE date = ? AND is_refund = 0
+    ORDER BY timestamp
+  `,
+  ).iterate(gameDate) as IterableIterator<{
     timestamp: string;
     location: string;
     qty: number;
     item: string;
-    category: string;
-  }[];
-
-  if (!rows.length) {
-    return [];
-  }
+  }>;
 
   const bucketMs = bucketSeconds * 1000;
   const parseTs = (ts: string) => new Date(ts).getTime();
-  const firstTs = parseTs(rows[0].timestamp);
+  let firstTs: number | null = null;
 
   const bucketMap = new Map<number, SimBucket>();
 
+  // Stream rows from SQLite instead of materializing the whole game day first
   for (const row of rows) {
     const tsMs = parseTs(row.timestamp);
+    if (firstTs === null) firstTs = tsMs;
     const offset = Math.floor((tsMs - firstTs) / bucketMs);
     const startMs = firstTs + offset * bucketMs;
     const endMs = startMs + bucketMs;
@@ -85,10 +78,22 @@ function buildBuckets(gameDate: string, bucketSeconds: number): SimBucket[] {
   return Array.from(bucketMap.values()).sort((a, b) => a.startMs - b.startMs);
 }
 
+const MAX_QUEUED_FRAMES = 64;
+
+const SSE_HEADERS = {
+  'Content-Type': 'text/event-stream',
+  'Cache-Control': 'no-cache, no-transform',
+  Connection: 'keep-alive',
+};
+
 function toSSE(data: unknown): string {
   return `data: ${JSON.stringify(data)}\n\n`;
 }
 
+// Error frames never vary, so serialize them once at module load
+const MISSING_DATE_FRAME = toSSE({ error: 'Missing required date=YYYY-MM-DD parameter' });
+const NO_TRANSACTIONS_FRAME = toSSE({ error: 'No transactions found for that date' });
+
 export async function GET(req: NextRequest) {
   const { searchParams } = new URL(req.url);
   const date = searchParams.get('date');
@@ -97,16 +102,7 @@ export async function GET(req: NextRequest) {
   const windowParam = searchParams.get('window'); // currently unused, kept for future rolling-window logic
 
   if (!date) {
-    return new Response(
-      toSSE({ error: 'Missing required date=YYYY-MM-DD parameter' }),
-      {
-        headers: {
-          'Content-Type': 'text/event-stream',
-          'Cache-Control': 'no-cache, no-transform',
-          Connection: 'keep-alive',
-        },
-      },
-    );
+    return new Response(MISSING_DATE_FRAME, { headers: SSE_HEADERS });
   }
 
   // Simulation parameters (with sensible defaults)
@@ -116,16 +112,7 @@ export async function GET(req: NextRequest) {
 
   const buckets = buildBuckets(date, bucketSeconds);
   if (!buckets.length) {
-    return new Response(
-      toSSE({ error: 'No transactions found for that date' }),
-      {
-        headers: {
-          'Content-Type': 'text/event-stream',
-          'Cache-Control': 'no-cache, no-transform',
-          Connection: 'keep-alive',
-        },
-      },
-    );
+    return new Response(NO_TRANSACTIONS_FRAME, { headers: SSE_HEADERS });
   }
 
   const bucketDurationMinutes = bucketSeconds / 60;
@@ -139,98 +126,136 @@ export async function GET(req: NextRequest) {
 
   const encoder = new TextEncoder();
 
-  const stream = new ReadableStream({
-    start(controller) {
-      let index = 0;
-
-      const intervalMs = Math.max(200, (bucketSeconds * 1000) / speed);
-
-      const timer = setInterval(() => {
-        if (index >= buckets.length) {
-          clearInterval(timer);
-          controller.close();
-          return;
-        }
-
-        const bucket = buckets[index++];
-
-        // Capacity from historical 75th percentile (used for utilization display only; wait uses getHistoricalCapacityPerStand)
-        const locations: Record<
-          string,
-          {
-            orders_in_bucket: number;
-            qty_in_bucket: number;
-            orders_per_min: number;
-            utilization: number;
-            wait_minutes: number;
-            crowd_index: number;
-            top_items: { item: string; qty: number }[];
+  // Encode every frame up front so each timer tick only enqueues ready-made bytes
+  const frames = buckets.map((bucket) => {
+    // Capacity from historical 75th percentile (used for utilization display only; wait uses getHistoricalCapacityPerStand)
+    const locations: Record<
+      string,
+      {
+        orders_in_bucket: number;
+        qty_in_bucket: number;
+        orders_per_min: number;
+        utilization: number;
+        wait_minutes: number;
+        crowd_index: number;
+        top_items: { item: string; qty: number }[];
+      }
+    > = {};
+
+    let maxUtilization = 0;
+
+    for (const [locName, loc] of Object.entries(bucket.locations)) {
+      const itemsPerMin =
+        loc.qtyInBucket / bucketDurationMinutes || 0;
+      const capacity = capacityPerStand[locName] ?? 1.2;
+      const effectiveCapacity = capacity * CAPACITY_FACTOR;
+      const utilization = Math.min(
+        3,
+        effectiveCapacity > 0 ? itemsPerMin / effectiveCapacity : 0,
+      );
+      const rawWait = BASE_WAIT + Math.pow(utilization, 1.2) * WAIT_SCALE;
+      const waitMinutes = Math.min(WAIT_CAP, rawWait);
+
+      maxUtilization = Math.max(maxUtilization, utilization);
+
+      const topItemsSorted = Object.entries(loc.topItems)
+        .sort((a, b) => b[1] - a[1])
+        .slice(0, 3)
+        .map(([item, qty]) => ({ item, qty }));
+
+      locations[locName] = {
+        orders_in_bucket: loc.ordersInBucket,
+        qty_in_bucket: loc.qtyInBucket,
+        orders_per_min: Number((loc.ordersInBucket / bucketDurationMinutes).toFixed(2)),
+        utilization: Number(utilization.toFixed(2)),
+        wait_minutes: Number(waitMinutes.toFixed(1)),
+        crowd_index: 0, // backfilled below
+        top_items: topItemsSorted,
+      };
+    }
+
+    // Normalize crowd index from utilization (0-1)
+    for (const loc of Object.values(locations)) {
+      const normUtil =
+        maxUtilization > 0 ? loc.utilization / maxUtilization : 0;
+      // Blend utilization and wait time into a single "crowd" index
+      const waitFactor = Math.min(loc.wait_minutes / 10, 1);
+      const crowd = Math.max(0, Math.min((normUtil + waitFactor) / 2, 1));
+      loc.crowd_index = Number(crowd.toFixed(2));
+    }
+
+    const payload = {
+      sim_time: new Date(bucket.endMs).toISOString(),
+      bucket_start: new Date(bucket.startMs).toISOString(),
+      bucket_end: new Date(bucket.endMs).toISOString(),
+      locations,
+    };
+
+    return encoder.encode(toSSE(payload));
+  });
+
+  let timer: ReturnType<typeof setTimeout> | undefined;
+  let pendingFrame: Uint8Array | null = null;
+  let finished = false;
+  let closed = false;
+
+  // The timer only produces frames; the runtime drains the queue to the socket on its own,
+  // so a slow client can't stretch the replay cadence. Each frame is a full snapshot, so
+  // once MAX_QUEUED_FRAMES are waiting we hold just the newest frame in pendingFrame —
+  // each tick overwrites it — and hand it over as soon as the client reads (pull) or the
+  // next tick finds room. The final frame is always delivered before the stream closes.
+  const flush = (controller: ReadableStreamDefaultController<Uint8Array>) => {
+    if (closed) return;
+    if (pendingFrame && (controller.desiredSize ?? 1) > 0) {
+      // Clear before enqueueing: enqueue() can re-enter pull() synchronously
+      const frame = pendingFrame;
+      pendingFrame = null;
+      controller.enqueue(frame);
+    }
+    if (finished && !pendingFrame) {
+      closed = true;
+      controller.close();
+    }
+  };
+
+  const stream = new ReadableStream<Uint8Array>(
+    {
+      start(controller) {
+        let index = 0;
+
+        const intervalMs = Math.max(200, (bucketSeconds * 1000) / speed);
+        const startedAt = performance.now();
+
+        // Schedule each tick against an absolute deadline (start + n * interval) so slow
+        // ticks or event-loop stalls don't accumulate drift the way a relative timer does
+        const tick = () => {
+          if (index >= frames.length) {
+            finished = true;
+            flush(controller);
+            return;
           }
-        > = {};
-
-        let maxUtilization = 0;
-
-        for (const [locName, loc] of Object.entries(bucket.locations)) {
-          const itemsPerMin =
-            loc.qtyInBucket / bucketDurationMinutes || 0;
-          const capacity = capacityPerStand[locName] ?? 1.2;
-          const effectiveCapacity = capacity * CAPACITY_FACTOR;
-          const utilization = Math.min(
-            3,
-            effectiveCapacity > 0 ? itemsPerMin / effectiveCapacity : 0,
-          );
-          const rawWait = BASE_WAIT + Math.pow(utilization, 1.2) * WAIT_SCALE;
-          const waitMinutes = Math.min(WAIT_CAP, rawWait);
-
-          maxUtilization = Math.max(maxUtilization, utilization);
-
-          const topItemsSorted = Object.entries(loc.topItems)
-            .sort((a, b) => b[1] - a[1])
-            .slice(0, 3)
-            .map(([item, qty]) => ({ item, qty }));
-
-          locations[locName] = {
-            orders_in_bucket: loc.ordersInBucket,
-            qty_in_bucket: loc.qtyInBucket,
-            orders_per_min: Number((loc.ordersInBucket / bucketDurationMinutes).toFixed(2)),
-            utilization: Number(utilization.toFixed(2)),
-            wait_minutes: Number(waitMinutes.toFixed(1)),
-            crowd_index: 0, // backfilled below
-            top_items: topItemsSorted,
-          };
-        }
-
-        // Normalize crowd index from utilization (0-1)
-        for (const loc of Object.values(locations)) {
-          const normUtil =
-            maxUtilization > 0 ? loc.utilization / maxUtilization : 0;
-          // Blend utilization and wait time into a single "crowd" index
-          const waitFactor = Math.min(loc.wait_minutes / 10, 1);
-          const crowd = Math.max(0, Math.min((normUtil + waitFactor) / 2, 1));
-          loc.crowd_index = Number(crowd.toFixed(2));
-        }
-
-        const payload = {
-          sim_time: new Date(bucket.endMs).toISOString(),
-          bucket_start: new Date(bucket.startMs).toISOString(),
-          bucket_end: new Date(bucket.endMs).toISOString(),
-          locations,
+
+          pendingFrame = frames[index++];
+          flush(controller);
+
+          const deadline = startedAt + (index + 1) * intervalMs;
+          timer = setTimeout(tick, Math.max(0, deadline - performance.now()));
         };
 
-        controller.enqueue(encoder.encode(toSSE(payload)));
-      }, intervalMs);
-    },
-    cancel() {
-      // Nothing else to do; the interval is cleaned up in start()
+        timer = setTimeout(tick, intervalMs);
+      },
+      pull(controller) {
+        flush(controller);
+      },
+      cancel() {
+        // Client disconnected — stop ticking so we don't enqueue into a closed stream
+        closed = true;
+        clearTimeout(timer);
+      },
     },
-  });
+    new CountQueuingStrategy({ highWaterMark: MAX_QUEUED_FRAMES }),
+  );
 
-  return new Response(stream, {
-    headers: {
-      'Content-Type': 'text/event-stream',
-      'Cache-Control': 'no-cache, no-transform',
-      Connection: 'keep-alive',
-    },
-  });
+  return new Response(stream, { headers: SSE_HEADERS });
 }
 
@@ -2,6 +2,7 @@ import Database from 'better-sqlite3';
 import path from 'path';
 
 let db: Database.Database | null = null;
+const statements = new Map<string, Database.Statement>();
 
 export function getDb(): Database.Database {
   if (!db) {
@@ -11,3 +12,13 @@ export function getDb(): Database.Database {
   }
   return db;
 }
+
+/** Compile `sql` once and reuse the statement on later calls (fixed SQL only — not for ad-hoc queries) */
+export function prepare(sql: string): Database.Statement {
+  let stmt = statements.get(sql);
+  if (!stmt) {
+    stmt = getDb().prepare(sql);
+    statements.set(sql, stmt);
+  }
+  return stmt;
+}
@@ -1,18 +1,39 @@
-import { getDb } from './db';
+import { getDb, prepare } from './db';
+
+// ---- Lookup cache ----
+// Historical aggregates (lookup lists, per-matchup demand, stand capacity) only change
+// when the DB is re-seeded, so keep each result for a few minutes instead of rescanning
+// transactions per request. Keys include the query arguments (JSON-encoded so distinct
+// argument lists can't collide); oldest entries are evicted first once the cache is full,
+// since opponent/day come straight from request params.
+const LOOKUP_TTL_MS = 5 * 60 * 1000;
+const LOOKUP_MAX_ENTRIES = 256;
+const lookupCache = new Map<string, { value: unknown; expires: number }>();
+
+function cachedLookup<T>(key: string, run: () => T): T {
+  const hit = lookupCache.get(key);
+  if (hit && hit.expires > Date.now()) return hit.value as T;
+  const value = run();
+  lookupCache.delete(key);
+  if (lookupCache.size >= LOOKUP_MAX_ENTRIES) {
+    lookupCache.delete(lookupCache.keys().next().value as string);
+  }
+  lookupCache.set(key, { value, expires: Date.now() + LOOKUP_TTL_MS });
+  return value;
+}
 
 // ---- Overview KPIs ----
 export function getOverviewKPIs() {
-  const db = getDb();
-  const totalGames = db.prepare('SELECT COUNT(*) as v FROM games').get() as any;
-  const totalItems = db.prepare('SELECT SUM(qty) as v FROM transactions WHERE is_refund = 0').get() as any;
-  const totalOrders = db.prepare(`
+  const totalGames = prepare('SELECT COUNT(*) as v FROM games').get() as any;
+  const totalItems = prepare('SELECT SUM(qty) as v FROM transactions WHERE is_refund = 0').get() as any;
+  const totalOrders = prepare(`
     SELECT COUNT(DISTINCT date || time || location) as v FROM transactions WHERE is_refund = 0
   `).get() as any;
-  const avgItemsPerGame = db.prepare(`
+  const avgItemsPerGame = prepare(`
     SELECT CAST(SUM(qty) AS REAL) / COUNT(DISTINCT game_id) as v
     FROM transactions WHERE is_refund = 0 AND game_id IS NOT NULL
   `).get() as any;
-  const avgAttendance = db.prepare('SELECT CAST(AVG(attendance) AS INTEGER) as v FROM games WHERE attendance IS NOT NULL').get() as any;
+  const avgAttendance = prepare('SELECT CAST(AVG(attendance) AS INTEGER) as v FROM games WHERE attendance IS NOT NULL').get() as any;
   return {
     totalGames: totalGames.v,
     totalItems: totalItems.v,
@@ -24,7 +45,6 @@ export function getOverviewKPIs() {
 
 // ---- Sales by Location ----
 export function getSalesByLocation(filters?: { opponent?: string; dayOfWeek?: string }) {
-  const db = getDb();
   let where = 'WHERE t.is_refund = 0';
   const params: any[] = [];
   if (filters?.opponent) {
@@ -35,7 +55,7 @@ export function getSalesByLocation(filters?: { opponent?: string; dayOfWeek?: st
     where += ' AND g.day_of_week = ?';
     params.push(filters.dayOfWeek);
   }
-  return db.prepare(`
+  return prepare(`
     SELECT t.location, SUM(t.qty) as total_items, COUNT(DISTINCT t.date || t.time || t.location) as total_orders
     FROM transactions t
     LEFT JOIN games g ON t.game_id = g.game_id
@@ -47,8 +67,7 @@ export function getSalesByLocation(filters?: { opponent?: string; dayOfWeek?: st
 
 // ---- Sales Trend Over Season ----
 export function getSalesTrend() {
-  const db = getDb();
-  return db.prepare(`
+  return prepare(`
     SELECT g.game_date as date, g.opponent, g.attendance, SUM(t.qty) as total_items
     FROM transactions t
     JOIN games g ON t.game_id = g.game_id
@@ -60,14 +79,13 @@ export function getSalesTrend() {
 
 // ---- Top Items ----
 export function getTopItems(limit = 10, location?: string) {
-  const db = getDb();
   let where = 'WHERE is_refund = 0';
   const params: any[] = [];
   if (location) {
     where += ' AND location = ?';
     params.push(location);
   }
-  return db.prepare(`
+  return prepare(`
     SELECT item, category, SUM(qty) as total_qty, COUNT(*) as num_transactions
     FROM transactions
     ${where}
@@ -79,8 +97,7 @@ export function getTopItems(limit = 10, location?: string) {
 
 // ---- Hourly Heatmap Data ----
 export function getHourlyHeatmap() {
-  const db = getDb();
-  return db.prepare(`
+  return prepare(`
     SELECT location, CAST(SUBSTR(time, 1, 2) AS INTEGER) as hour, SUM(qty) as total_items
     FROM transactions
     WHERE is_refund = 0
@@ -91,8 +108,7 @@ export function getHourlyHeatmap() {
 
 // ---- Category Breakdown by Location ----
 export function getCategoryByLocation() {
-  const db = getDb();
-  return db.prepare(`
+  return prepare(`
     SELECT location, category, SUM(qty) as total_items
     FROM transactions
     WHERE is_refund = 0
@@ -103,8 +119,7 @@ export function getCategoryByLocation() {
 
 // ---- Peak Throughput (orders/minute by location) ----
 export function getPeakThroughput() {
-  const db = getDb();
-  return db.prepare(`
+  return prepare(`
     SELECT location,
       CAST(SUBSTR(time, 1, 2) AS INTEGER) as hour,
       COUNT(DISTINCT date || SUBSTR(time, 1, 5) || location) as orders_per_min_window,
@@ -118,8 +133,7 @@ export function getPeakThroughput() {
 
 // ---- Attendance vs Sales ----
 export function getAttendanceVsSales() {
-  const db = getDb();
-  return db.prepare(`
+  return prepare(`
     SELECT g.game_date, g.opponent, g.attendance, g.day_of_week,
       SUM(t.qty) as total_items,
       COUNT(DISTINCT t.date || t.time || t.location) as total_orders
@@ -133,8 +147,7 @@ export function getAttendanceVsSales() {
 
 // ---- Sales by Opponent ----
 export function getSalesByOpponent() {
-  const db = getDb();
-  return db.prepare(`
+  return prepare(`
     SELECT g.opponent, COUNT(DISTINCT g.game_id) as num_games,
       CAST(AVG(g.attendance) AS INTEGER) as avg_attendance,
       CAST(SUM(t.qty) AS REAL) / COUNT(DISTINCT g.game_id) as avg_items_per_game
@@ -148,8 +161,7 @@ export function getSalesByOpponent() {
 
 // ---- Sales by Day of Week ----
 export function getSalesByDayOfWeek() {
-  const db = getDb();
-  return db.prepare(`
+  return prepare(`
     SELECT g.day_of_week, COUNT(DISTINCT g.game_id) as num_games,
       CAST(AVG(g.attendance) AS INTEGER) as avg_attendance,
       CAST(SUM(t.qty) AS REAL) / COUNT(DISTINCT g.game_id) as avg_items_per_game
@@ -163,9 +175,8 @@ export function getSalesByDayOfWeek() {
 
 // ---- Game Period Timeline ----
 export function getGamePeriodTimeline() {
-  const db = getDb();
   // Approximate game periods by time relative to typical 7pm puck drop
-  return db.prepare(`
+  return prepare(`
     SELECT
       CASE
         WHEN CAST(SUBSTR(time, 1, 2) AS INTEGER) < 18 THEN 'Pre-Game (Early)'
@@ -200,14 +211,12 @@ export function getGamePeriodTimeline() {
 
 // ---- Predictions for Upcoming Games ----
 export function getUpcomingGames() {
-  const db = getDb();
-  return db.prepare('SELECT * FROM upcoming_games ORDER BY game_date').all();
+  return prepare('SELECT * FROM upcoming_games ORDER BY game_date').all();
 }
 
 export function getPredictionsForGame(opponent: string, dayOfWeek: string) {
-  const db = getDb();
   // Get historical average by location for similar games
-  return db.prepare(`
+  return prepare(`
     SELECT t.location,
       CAST(SUM(t.qty) AS REAL) / COUNT(DISTINCT g.game_id) as predicted_items,
       COUNT(DISTINCT g.game_id) as sample_games
@@ -221,9 +230,8 @@ export function getPredictionsForGame(opponent: string, dayOfWeek: string) {
 }
 
 export function getStaffingRecommendation(opponent: string, dayOfWeek: string) {
-  const db = getDb();
   // Peak hour analysis for staffing
-  return db.prepare(`
+  return prepare(`
     SELECT t.location,
       CAST(SUBSTR(t.time, 1, 2) AS INTEGER) as hour,
       CAST(SUM(t.qty) AS REAL) / COUNT(DISTINCT g.game_id) as avg_items_per_hour,
@@ -239,8 +247,7 @@ export function getStaffingRecommendation(opponent: string, dayOfWeek: string) {
 
 // ---- Express Menu (high-burst items) ----
 export function getExpressMenuSuggestions() {
-  const db = getDb();
-  return db.prepare(`
+  return prepare(`
     SELECT item, category, SUM(qty) as total_qty,
       COUNT(DISTINCT date) as num_game_days,
       CAST(SUM(qty) AS REAL) / COUNT(DISTINCT date) as avg_per_game
@@ -255,8 +262,7 @@ export function getExpressMenuSuggestions() {
 
 // ---- Location Traffic for Arena Map ----
 export function getLocationTraffic() {
-  const db = getDb();
-  return db.prepare(`
+  return prepare(`
     SELECT location,
       SUM(qty) as total_items,
       COUNT(DISTINCT date || time || location) as total_orders,
@@ -270,16 +276,16 @@ export function getLocationTraffic() {
 
 // ---- Opponents List ----
 export function getOpponents() {
-  const db = getDb();
-  return db.prepare('SELECT DISTINCT opponent FROM games ORDER BY opponent').all();
+  return cachedLookup('opponents', () =>
+    prepare('SELECT DISTINCT opponent FROM games ORDER BY opponent').all(),
+  );
 }
 
 // ---- Fan-Facing Queries ----
 
 /** 10-minute bucket demand per location for similar games */
 export function getDemandCurve(opponent: string, dayOfWeek: string) {
-  const db = getDb();
-  return db.prepare(`
+  return cachedLookup(JSON.stringify(['demandCurve', opponent, dayOfWeek]), () => prepare(`
     SELECT t.location,
       CAST(SUBSTR(t.time, 1, 2) AS INTEGER) as hour,
       (CAST(SUBSTR(t.time, 4, 2) AS INTEGER) / 10) * 10 as min_bucket,
@@ -289,38 +295,35 @@ export function getDemandCurve(opponent: string, dayOfWeek: string) {
     WHERE t.is_refund = 0 AND (g.opponent = ? OR g.day_of_week = ?)
     GROUP BY t.location, hour, min_bucket
     ORDER BY t.location, hour, min_bucket
-  `).all(opponent, dayOfWeek);
+  `).all(opponent, dayOfWeek));
 }
 
 /** Category distribution per location for blended service rate */
 export function getCategoryMixForFan(opponent: string, dayOfWeek: string) {
-  const db = getDb();
-  return db.prepare(`
+  return cachedLookup(JSON.stringify(['categoryMix', opponent, dayOfWeek]), () => prepare(`
     SELECT t.location, t.category,
       CAST(SUM(t.qty) AS REAL) / COUNT(DISTINCT g.game_id) as avg_items
     FROM transactions t
     JOIN games g ON t.game_id = g.game_id
     WHERE t.is_refund = 0 AND (g.opponent = ? OR g.day_of_week = ?)
     GROUP BY t.location, t.category
-  `).all(opponent, dayOfWeek);
+  `).all(opponent, dayOfWeek));
 }
 
 /** Which categories each location serves (for "what do you want?" filter) */
 export function getLocationCategories() {
-  const db = getDb();
-  return db.prepare(`
+  return cachedLookup('locationCategories', () => prepare(`
     SELECT location, category, SUM(qty) as total
     FROM transactions WHERE is_refund = 0
     GROUP BY location, category
     HAVING total > 100
     ORDER BY location, total DESC
-  `).all();
+  `).all());
 }
 
 /** Top items per location for fan cards */
 export function getTopItemsByLocation(opponent: string, dayOfWeek: string) {
-  const db = getDb();
-  return db.prepare(`
+  return cachedLookup(JSON.stringify(['topItemsByLocation', opponent, dayOfWeek]), () => prepare(`
     SELECT t.location, t.item, t.category,
       CAST(SUM(t.qty) AS REAL) / COUNT(DISTINCT g.game_id) as avg_qty
     FROM transactions t
@@ -328,7 +331,7 @@ export function getTopItemsByLocation(opponent: string, dayOfWeek: string) {
     WHERE t.is_refund = 0 AND (g.opponent = ? OR g.day_of_week = ?)
     GROUP BY t.location, t.item, t.category
     ORDER BY t.location, avg_qty DESC
-  `).all(opponent, dayOfWeek);
+  `).all(opponent, dayOfWeek));
 }
 
 // ---- Generic Query (for AI insights) ----
@@ -342,18 +345,33 @@ export function runQuery(sql: string) {
 }
 
 // ---- Game dates (for simulation dropdown) ----
+/** Distinct transaction dates with day/opponent, already in the /api/game-dates response shape */
+export function getGameDateOptions(): { date: string; day: string; opponent: string }[] {
+  // Loose index scan over idx_transactions_date — one B-tree seek per distinct date
+  // instead of reading every transaction row
+  return prepare(`
+    WITH RECURSIVE t(date) AS (
+      SELECT MIN(date) FROM transactions
+      UNION ALL
+      SELECT (SELECT MIN(date) FROM transactions WHERE date > t.date) FROM t WHERE t.date IS NOT NULL
+    )
+    SELECT t.date, COALESCE(g.day_of_week, '') AS day, COALESCE(g.opponent, '') AS opponent
+    FROM t
+    LEFT JOIN games g ON g.game_date = t.date
+    WHERE t.date IS NOT NULL
+    ORDER BY t.date ASC
+  `).all() as { date: string; day: string; opponent: string }[];
+}
+
 export function getGameDates(): string[] {
-  const db = getDb();
-  const rows = db.prepare('SELECT DISTINCT date FROM transactions ORDER BY date ASC').all() as { date: string }[];
+  const rows = prepare('SELECT DISTINCT date FROM transactions ORDER BY date ASC').all() as { date: string }[];
   return rows.map((r) => r.date);
 }
 
 // ---- Puck drop by game date ----
 export function getPuckDropByDate(gameDate: string): string | null {
-  const db = getDb();
   try {
-    const row = db
-      .prepare('SELECT puck_drop_time FROM games WHERE game_date = ?')
+    const row = prepare('SELECT puck_drop_time FROM games WHERE game_date = ?')
       .get(gameDate) as { puck_drop_time: string | null } | undefined;
     return row?.puck_drop_time ?? null;
   } catch {
@@ -363,37 +381,33 @@ export function getPuckDropByDate(gameDate: string): string | null {
 
 // ---- Historical capacity per stand (items/min, 75th percentile of 1-min buckets) ----
 export function getHistoricalCapacityPerStand(): Record<string, number> {
-  const db = getDb();
   try {
-    const rows = db
-      .prepare(
-        `
-      SELECT location,
-        date,
-        SUBSTR(time, 1, 5) AS time_minute,
-        SUM(ABS(qty)) AS items_this_minute
-      FROM transactions
-      WHERE is_refund = 0
-      GROUP BY location, date, time_minute
-      `,
-      )
-      .all() as { location: string; items_this_minute: number }[];
-
-    const byLocation: Record<string, number[]> = {};
-    for (const r of rows) {
-      if (!byLocation[r.location]) byLocation[r.location] = [];
-      byLocation[r.location].push(r.items_this_minute);
-    }
-
-    const capacity: Record<string, number> = {};
-    for (const [loc, values] of Object.entries(byLocation)) {
-      values.sort((a, b) => a - b);
-      const idx = Math.floor(values.length * 0.75);
-      const p75 = values[idx] ?? values[values.length - 1] ?? 1;
-      capacity[loc] = Math.max(0.5, p75);
-    }
-
-    return capacity;
+    return cachedLookup('capacityPerStand', () => {
+      // ~50K minute buckets: select only the two columns we use and read them as raw
+      // [location, items] arrays so better-sqlite3 skips building a keyed object per row
+      const rows = prepare(`
+        SELECT location, SUM(ABS(qty)) AS items_this_minute
+        FROM transactions
+        WHERE is_refund = 0
+        GROUP BY location, date, SUBSTR(time, 1, 5)
+      `).raw().iterate() as IterableIterator<[string, number]>;
+
+      const byLocation: Record<string, number[]> = {};
+      for (const [location, itemsThisMinute] of rows) {
+        if (!byLocation[location]) byLocation[location] = [];
+        byLocation[location].push(itemsThisMinute);
+      }
+
+      const capacity: Record<string, number> = {};
+      for (const [loc, values] of Object.entries(byLocation)) {
+        values.sort((a, b) => a - b);
+        const idx = Math.floor(values.length * 0.75);
+        const p75 = values[idx] ?? values[values.length - 1] ?? 1;
+        capacity[loc] = Math.max(0.5, p75);
+      }
+
+      return capacity;
+    });
   } catch {
     return {};
   }
@@ -415,18 +429,15 @@ const FALLBACK_SEAT_ZONES: { zone_id: string; zone_label: string; map_x: number;
 ];
 
 export function getSeatZones(): { zone_id: string; zone_label: string; map_x: number; map_y: number }[] {
-  const db = getDb();
   try {
-    const rows = db
-      .prepare('SELECT zone_id, zone_label, map_x, map_y FROM seat_zones ORDER BY zone_id')
+    const rows = prepare('SELECT zone_id, zone_label, map_x, map_y FROM seat_zones ORDER BY zone_id')
       .all() as { zone_id: string; zone_label: string; map_x: number; map_y: number }[];
     if (rows.length > 0) return rows;
   } catch {
     // map_x/map_y columns may not exist
   }
   try {
-    const fallback = db
-      .prepare('SELECT zone_id, zone_label FROM seat_zones ORDER BY zone_id')
+    const fallback = prepare('SELECT zone_id, zone_label FROM seat_zones ORDER BY zone_id')
       .all() as { zone_id: string; zone_label: string }[];
     if (fallback.length > 0) {
       return fallback.map((r) => ({